@@ -2,19 +2,24 @@ import json
 import asyncio
 import sys
 import os
-from typing import List
+import logging
+from typing import List, Optional
 from anyio import to_thread
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Query, Header
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
 
 from services import merge_service
 from services import tidal_service
+from services import profiling_service
 from dependencies import require_auth
 from utils.url_parser import extract_playlist_id
+from utils.export_formats import EXPORT_FORMATS, export_header, export_row, export_error
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["api"])
 
@@ -26,6 +31,10 @@ class MergeRequest(BaseModel):
     name: str
     keepItTidy: bool = False
 
+class ExportRequest(BaseModel):
+    playlistIds: List[str]
+    keepItTidy: bool = False
+
 @router.post("/playlist/resolve")
 async def resolve_playlist(request: ResolveRequest, _: bool = Depends(require_auth)):
     parsed = extract_playlist_id(request.url)
@@ -40,8 +49,25 @@ async def resolve_playlist(request: ResolveRequest, _: bool = Depends(require_au
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+PROFILE_MODES = {'1': False, 'true': False, 'spans': False, 'cpu': True}
+
+def _resolve_profile_mode(flag: Optional[str]) -> Optional[bool]:
+    if not flag:
+        return None
+    mode = flag.strip().lower()
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile mode '{flag}'. Use one of: {', '.join(PROFILE_MODES)}")
+    if not profiling_service.is_enabled():
+        raise HTTPException(status_code=403, detail="Merge profiling is disabled on this server")
+    return PROFILE_MODES[mode]
+
 @router.post("/merge")
-async def merge_playlists(request: MergeRequest, _: bool = Depends(require_auth)):
+async def merge_playlists(
+    request: MergeRequest,
+    profile: Optional[str] = None,
+    x_merge_profile: Optional[str] = Header(None),
+    _: bool = Depends(require_auth)
+):
     if not request.playlistIds:
         raise HTTPException(status_code=400, detail="No playlists provided")
     
@@ -51,24 +77,33 @@ async def merge_playlists(request: MergeRequest, _: bool = Depends(require_auth)
     if len(request.playlistIds) < 2:
         raise HTTPException(status_code=400, detail="At least 2 playlists required")
     
+    cpu_profile = _resolve_profile_mode(profile or x_merge_profile)
+    trace = profiling_service.start_trace(cpu_profile) if cpu_profile is not None else None
+    
     queue: asyncio.Queue = asyncio.Queue()
     merge_complete = asyncio.Event()
     
+    if trace:
+        await queue.put({'mergeId': trace.merge_id, 'profiling': True})
+    
     async def progress_callback(data: dict):
         await queue.put(data)
     
     async def run_merge():
         try:
-            result = await merge_service.merge_playlists(
-                request.playlistIds,
-                request.name,
-                progress_callback,
-                request.keepItTidy
-            )
+            with profiling_service.activate(trace):
+                result = await merge_service.merge_playlists(
+                    request.playlistIds,
+                    request.name,
+                    progress_callback,
+                    request.keepItTidy
+                )
             await queue.put({'complete': True, 'result': result})
         except Exception as e:
             await queue.put({'error': str(e)})
         finally:
+            if trace:
+                trace.finish()
             merge_complete.set()
     
     asyncio.create_task(run_merge())
@@ -77,7 +112,12 @@ async def merge_playlists(request: MergeRequest, _: bool = Depends(require_auth)
         while True:
             try:
                 msg = await asyncio.wait_for(queue.get(), timeout=30.0)
-                yield f"data: {json.dumps(msg)}\n\n"
+                if trace:
+                    with trace.span('sse.serialize', 'sse'):
+                        payload = json.dumps(msg)
+                else:
+                    payload = json.dumps(msg)
+                yield f"data: {payload}\n\n"
                 
                 if msg.get('complete') or msg.get('error'):
                     break
@@ -86,12 +126,106 @@ async def merge_playlists(request: MergeRequest, _: bool = Depends(require_auth)
         
         await merge_complete.wait()
     
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+    if trace:
+        headers["X-Merge-Id"] = trace.merge_id
+    
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
+        headers=headers
+    )
+
+@router.get("/merge/{merge_id}/trace")
+async def download_merge_trace(merge_id: str, format: str = "chrome", _: bool = Depends(require_auth)):
+    if not profiling_service.is_enabled():
+        raise HTTPException(status_code=403, detail="Merge profiling is disabled on this server")
+    
+    trace = profiling_service.get_trace(merge_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this merge")
+    
+    if format == "chrome":
+        content = trace.to_chrome_trace()
+    elif format == "speedscope":
+        content = trace.to_speedscope()
+        if content is None:
+            raise HTTPException(status_code=404, detail="No CPU profile recorded for this merge (use profile=cpu)")
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported format. Use one of: chrome, speedscope")
+    
+    return JSONResponse(
+        content,
+        headers={"Content-Disposition": f'attachment; filename="merge-{merge_id}.{format}.json"'}
+    )
+
+async def _export_response(playlist_ids: List[str], keep_it_tidy: bool, fmt: str) -> StreamingResponse:
+    if not playlist_ids:
+        raise HTTPException(status_code=400, detail="No playlists provided")
+    
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    tracks = merge_service.iter_unique_tracks(playlist_ids, keep_it_tidy)
+    
+    # Pull the first row before sending headers so early failures get a real status code
+    try:
+        first_track = await tracks.__anext__()
+    except StopAsyncIteration:
+        first_track = None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def row_generator():
+        header = export_header(fmt)
+        if header:
+            yield header
+        if first_track is None:
+            return
+        yield export_row(fmt, first_track)
+        try:
+            async for track in tracks:
+                yield export_row(fmt, track)
+        except Exception as e:
+            logger.error(f"Export failed mid-stream: {e}")
+            error_row = export_error(fmt, str(e))
+            if error_row is None:
+                # No in-band error row for this format; abort so the client sees a truncated body
+                raise
+            yield error_row
+        finally:
+            await tracks.aclose()
+    
+    return StreamingResponse(
+        row_generator(),
+        media_type=EXPORT_FORMATS[fmt],
         headers={
+            "Content-Disposition": f'attachment; filename="merged.{fmt}"',
             "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
         }
     )
+
+@router.get("/merge/export")
+async def export_merge_get(
+    playlistIds: List[str] = Query(...),
+    keepItTidy: bool = False,
+    format: str = "ndjson",
+    _: bool = Depends(require_auth)
+):
+    return await _export_response(playlistIds, keepItTidy, format)
+
+@router.post("/merge/export")
+async def export_merge_post(
+    request: ExportRequest,
+    format: str = "ndjson",
+    _: bool = Depends(require_auth)
+):
+    return await _export_response(request.playlistIds, request.keepItTidy, format)
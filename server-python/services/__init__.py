@@ -1,7 +1,9 @@
 from .auth_service import AuthService
 from .tidal_service import TidalService
 from .merge_service import MergeService
+from .profiling_service import ProfilingService
 
 auth_service = AuthService()
 tidal_service = TidalService()
 merge_service = MergeService()
+profiling_service = ProfilingService()
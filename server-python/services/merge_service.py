@@ -1,13 +1,45 @@
 import logging
 import asyncio
-from typing import List, Callable, Optional, Dict, Set, Any
-from anyio import to_thread
+from typing import List, Callable, Optional, Dict, Set, Any, AsyncIterator, Iterator
+
+from .profiling_service import run_sync, span, traced
+from .tidal_service import TrackRecord
+from .resilience import RESILIENCE_ERRORS
 
 logger = logging.getLogger(__name__)
 
 MAX_DUPLICATES_RETURNED = 200
 TRACK_LIMIT = 10000
 
+@traced('tidal.playlist_tracks_page')
+def _next_track_page(pages: Iterator[List[TrackRecord]]) -> Optional[List[TrackRecord]]:
+    return next(pages, None)
+
+TRACK_NEW = 'new'
+TRACK_INTRA_DUPLICATE = 'intra'
+TRACK_CROSS_DUPLICATE = 'cross'
+
+class _TrackDeduper:
+    def __init__(self, keep_it_tidy: bool):
+        self.keep_it_tidy = keep_it_tidy
+        self._seen_track_ids: Set[str] = set()
+        self._tracks_in_this_playlist: Set[str] = set()
+    
+    def start_playlist(self):
+        self._tracks_in_this_playlist = set()
+    
+    def classify(self, track_id: str) -> str:
+        if track_id in self._tracks_in_this_playlist:
+            return TRACK_INTRA_DUPLICATE
+        self._tracks_in_this_playlist.add(track_id)
+        if track_id in self._seen_track_ids:
+            return TRACK_CROSS_DUPLICATE
+        self._seen_track_ids.add(track_id)
+        return TRACK_NEW
+    
+    def keeps(self, kind: str) -> bool:
+        return kind == TRACK_NEW or (kind == TRACK_INTRA_DUPLICATE and not self.keep_it_tidy)
+
 class MergeService:
     async def merge_playlists(
         self,
@@ -22,14 +54,15 @@ class MergeService:
         
         async def send_progress(message: str, progress: float = 0):
             if on_progress:
-                data = {'message': message, 'progress': progress}
-                if asyncio.iscoroutinefunction(on_progress):
-                    await on_progress(data)
-                else:
-                    on_progress(data)
+                with span('progress', 'sse', message=message, progress=progress):
+                    data = {'message': message, 'progress': progress}
+                    if asyncio.iscoroutinefunction(on_progress):
+                        await on_progress(data)
+                    else:
+                        on_progress(data)
         
         all_tracks: List[str] = []
-        seen_track_ids: Set[str] = set()
+        deduper = _TrackDeduper(keep_it_tidy)
         total_fetched = 0
         cross_playlist_duplicates = 0
         intra_playlist_duplicates = 0
@@ -46,97 +79,97 @@ class MergeService:
                 (i / total_playlists) * 40 if total_playlists > 0 else 0
             )
             
-            try:
-                playlist_info = await to_thread.run_sync(
-                    tidal_service.get_playlist_by_id, playlist_id
-                )
-                playlist_names[playlist_id] = playlist_info.get('name', f'Playlist {i + 1}')
-            except Exception:
-                playlist_names[playlist_id] = f'Playlist {i + 1}'
-            
-            tracks = await to_thread.run_sync(
-                tidal_service.get_playlist_tracks, playlist_id
-            )
-            playlist_track_counts.append(len(tracks))
+            with span('merge.playlist_info', 'merge', playlist=playlist_id):
+                try:
+                    playlist_info = await run_sync(
+                        tidal_service.get_playlist_by_id, playlist_id
+                    )
+                    playlist_names[playlist_id] = playlist_info.get('name', f'Playlist {i + 1}')
+                except RESILIENCE_ERRORS:
+                    raise
+                except Exception:
+                    playlist_names[playlist_id] = f'Playlist {i + 1}'
             
-            tracks_in_this_playlist: Set[str] = set()
+            deduper.start_playlist()
+            playlist_track_count = 0
             
-            for item in tracks:
-                track_id = item.get('id')
-                track_name = item.get('name', 'Unknown')
-                track_artist = item.get('artist', 'Unknown Artist')
-                
-                if track_id:
-                    total_fetched += 1
-                    
-                    is_intra_duplicate = track_id in tracks_in_this_playlist
-                    is_cross_duplicate = track_id in seen_track_ids and not is_intra_duplicate
-                    
-                    tracks_in_this_playlist.add(track_id)
-                    
-                    if is_intra_duplicate:
-                        intra_playlist_duplicates += 1
-                        intra_duplicate_counts[track_id] = intra_duplicate_counts.get(track_id, 0) + 1
-                        if not keep_it_tidy:
-                            all_tracks.append(track_id)
+            with span('merge.fetch', 'merge', playlist=playlist_id):
+                async for page in self._iter_track_pages(playlist_id):
+                    playlist_track_count += len(page)
                     
-                    elif is_cross_duplicate:
-                        cross_playlist_duplicates += 1
-                        if track_id in first_occurrence:
-                            current_playlist = playlist_names[playlist_id]
-                            if current_playlist not in first_occurrence[track_id]['playlists']:
-                                first_occurrence[track_id]['playlists'].append(current_playlist)
-                    
-                    else:
-                        seen_track_ids.add(track_id)
-                        all_tracks.append(track_id)
-                        first_occurrence[track_id] = {
-                            'name': track_name,
-                            'artist': track_artist,
-                            'playlists': [playlist_names[playlist_id]]
-                        }
-        
-        duplicate_details: List[dict] = []
-        
-        for track_id, info in first_occurrence.items():
-            if len(info['playlists']) > 1:
-                duplicate_details.append({
-                    'name': info['name'],
-                    'artist': info['artist'],
-                    'appearedIn': info['playlists'],
-                    'type': 'cross'
-                })
-        
-        if keep_it_tidy:
-            for track_id, count in intra_duplicate_counts.items():
-                if track_id in first_occurrence:
-                    info = first_occurrence[track_id]
+                    with span('merge.dedup', 'merge', playlist=playlist_id, tracks=len(page)):
+                        for item in page:
+                            track_id = item.id
+                            if not track_id:
+                                continue
+                            
+                            total_fetched += 1
+                            kind = deduper.classify(track_id)
+                            if deduper.keeps(kind):
+                                all_tracks.append(track_id)
+                            
+                            if kind == TRACK_INTRA_DUPLICATE:
+                                intra_playlist_duplicates += 1
+                                intra_duplicate_counts[track_id] = intra_duplicate_counts.get(track_id, 0) + 1
+                            
+                            elif kind == TRACK_CROSS_DUPLICATE:
+                                cross_playlist_duplicates += 1
+                                if track_id in first_occurrence:
+                                    current_playlist = playlist_names[playlist_id]
+                                    if current_playlist not in first_occurrence[track_id]['playlists']:
+                                        first_occurrence[track_id]['playlists'].append(current_playlist)
+                            
+                            else:
+                                first_occurrence[track_id] = {
+                                    'name': item.name,
+                                    'artist': item.artist,
+                                    'playlists': [playlist_names[playlist_id]]
+                                }
+            
+            playlist_track_counts.append(playlist_track_count)
+        
+        with span('merge.summarize', 'merge'):
+            duplicate_details: List[dict] = []
+            
+            for track_id, info in first_occurrence.items():
+                if len(info['playlists']) > 1:
                     duplicate_details.append({
                         'name': info['name'],
                         'artist': info['artist'],
-                        'appearedIn': f"{info['playlists'][0]} ({count + 1}x)",
-                        'type': 'intra'
+                        'appearedIn': info['playlists'],
+                        'type': 'cross'
                     })
-        
-        duplicate_details.sort(key=lambda x: x['name'].lower())
-        duplicates_returned = duplicate_details[:MAX_DUPLICATES_RETURNED]
-        
-        if keep_it_tidy:
-            total_duplicates = cross_playlist_duplicates + intra_playlist_duplicates
-        else:
-            total_duplicates = cross_playlist_duplicates
-        
-        logger.info(f"Total fetched: {total_fetched}, Unique: {len(all_tracks)}, "
-                   f"Cross-playlist dupes: {cross_playlist_duplicates}, Intra-playlist dupes: {intra_playlist_duplicates}")
-        
-        if not all_tracks:
-            raise Exception("No tracks found in the selected playlists")
-        
-        was_truncated = len(all_tracks) > TRACK_LIMIT
-        truncated_count = max(0, len(all_tracks) - TRACK_LIMIT)
-        if was_truncated:
-            all_tracks = all_tracks[:TRACK_LIMIT]
-            logger.info(f"Truncated tracks from {len(all_tracks) + truncated_count} to {TRACK_LIMIT}")
+            
+            if keep_it_tidy:
+                for track_id, count in intra_duplicate_counts.items():
+                    if track_id in first_occurrence:
+                        info = first_occurrence[track_id]
+                        duplicate_details.append({
+                            'name': info['name'],
+                            'artist': info['artist'],
+                            'appearedIn': f"{info['playlists'][0]} ({count + 1}x)",
+                            'type': 'intra'
+                        })
+            
+            duplicate_details.sort(key=lambda x: x['name'].lower())
+            duplicates_returned = duplicate_details[:MAX_DUPLICATES_RETURNED]
+            
+            if keep_it_tidy:
+                total_duplicates = cross_playlist_duplicates + intra_playlist_duplicates
+            else:
+                total_duplicates = cross_playlist_duplicates
+            
+            logger.info(f"Total fetched: {total_fetched}, Unique: {len(all_tracks)}, "
+                       f"Cross-playlist dupes: {cross_playlist_duplicates}, Intra-playlist dupes: {intra_playlist_duplicates}")
+            
+            if not all_tracks:
+                raise Exception("No tracks found in the selected playlists")
+            
+            was_truncated = len(all_tracks) > TRACK_LIMIT
+            truncated_count = max(0, len(all_tracks) - TRACK_LIMIT)
+            if was_truncated:
+                all_tracks = all_tracks[:TRACK_LIMIT]
+                logger.info(f"Truncated tracks from {len(all_tracks) + truncated_count} to {TRACK_LIMIT}")
         
         if total_duplicates > 0:
             if intra_playlist_duplicates > 0 and keep_it_tidy:
@@ -151,10 +184,11 @@ class MergeService:
             await send_progress(f"Found {len(all_tracks)} unique tracks", 50)
         
         await send_progress("Creating new playlist...", 60)
-        new_playlist = await to_thread.run_sync(
-            tidal_service.create_playlist, new_playlist_name
-        )
-        new_playlist_id = new_playlist['id']
+        with span('merge.create_playlist', 'merge'):
+            new_playlist = await run_sync(
+                tidal_service.create_playlist, new_playlist_name
+            )
+            new_playlist_id = new_playlist['id']
         
         await send_progress(f"Adding {len(all_tracks)} tracks to playlist...", 70)
         
@@ -175,17 +209,18 @@ class MergeService:
                 lambda: asyncio.create_task(report_batch_progress())
             )
         
-        try:
-            await to_thread.run_sync(
-                tidal_service.add_tracks_to_playlist, new_playlist_id, all_tracks, sync_batch_progress
-            )
-        except Exception as e:
-            logger.error(f"Failed to add tracks, cleaning up playlist {new_playlist_id}: {e}")
-            await send_progress("Merge failed, cleaning up...", 0)
-            await to_thread.run_sync(
-                tidal_service.delete_playlist, new_playlist_id
-            )
-            raise Exception(f"Failed to add tracks to playlist: {str(e)}")
+        with span('merge.add_tracks', 'merge', tracks=len(all_tracks)):
+            try:
+                await run_sync(
+                    tidal_service.add_tracks_to_playlist, new_playlist_id, all_tracks, sync_batch_progress
+                )
+            except Exception as e:
+                logger.error(f"Failed to add tracks, cleaning up playlist {new_playlist_id}: {e}")
+                await send_progress("Merge failed, cleaning up...", 0)
+                await run_sync(
+                    tidal_service.delete_playlist, new_playlist_id
+                )
+                raise Exception(f"Failed to add tracks to playlist: {str(e)}")
         
         await send_progress("Complete!", 100)
         
@@ -204,5 +239,37 @@ class MergeService:
             'wasTruncated': was_truncated,
             'truncatedCount': truncated_count
         }
+    
+    async def _iter_track_pages(self, playlist_id: str) -> AsyncIterator[List[TrackRecord]]:
+        from . import tidal_service
+        
+        pages = tidal_service.iter_playlist_tracks(playlist_id)
+        try:
+            while True:
+                page = await run_sync(_next_track_page, pages)
+                if page is None:
+                    break
+                yield page
+        finally:
+            pages.close()
+    
+    async def iter_unique_tracks(
+        self,
+        playlist_ids: List[str],
+        keep_it_tidy: bool = False
+    ) -> AsyncIterator[TrackRecord]:
+        deduper = _TrackDeduper(keep_it_tidy)
+        emitted = 0
+        
+        for playlist_id in playlist_ids:
+            deduper.start_playlist()
+            
+            async for page in self._iter_track_pages(playlist_id):
+                for item in page:
+                    if item.id and deduper.keeps(deduper.classify(item.id)):
+                        emitted += 1
+                        yield item
+        
+        logger.info(f"Export complete: {emitted} tracks from {len(playlist_ids)} playlists")
 
 merge_service = MergeService()
@@ -0,0 +1,281 @@
+import os
+import sys
+import time
+import uuid
+import logging
+import threading
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Any, Callable
+from anyio import to_thread
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv('ENABLE_MERGE_PROFILING', 'false').lower() in ('1', 'true', 'yes')
+MAX_STORED_TRACES = int(os.getenv('MAX_STORED_TRACES', 20))
+CPU_SAMPLE_INTERVAL = 0.005
+CPU_PROFILE_MAX_SECONDS = float(os.getenv('CPU_PROFILE_MAX_SECONDS', 600))
+
+_current_trace: ContextVar[Optional['MergeTrace']] = ContextVar('merge_trace', default=None)
+_NULL_SPAN = nullcontext()
+
+class _CpuSampler:
+    def __init__(self, trace: 'MergeTrace'):
+        self._trace = trace
+        self._stop = threading.Event()
+        self._frames: List[dict] = []
+        self._frame_index: Dict[tuple, int] = {}
+        # Identical stacks are folded into one entry with a summed weight, so memory tracks code paths, not duration
+        self._stacks: Dict[int, Dict[tuple, float]] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='merge-cpu-sampler', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+    
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = len(self._frames)
+            self._frame_index[key] = index
+            self._frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+    
+    def _run(self):
+        started = last = time.perf_counter()
+        while not self._stop.wait(CPU_SAMPLE_INTERVAL):
+            now = time.perf_counter()
+            if now - started > CPU_PROFILE_MAX_SECONDS:
+                logger.info(f"CPU profile stopped after {CPU_PROFILE_MAX_SECONDS:g}s")
+                break
+            elapsed_ms = (now - last) * 1000
+            last = now
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id in self._trace.active_thread_ids():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._frame_id(frame.f_code))
+                        frame = frame.f_back
+                    stack.reverse()
+                    stacks = self._stacks.setdefault(thread_id, {})
+                    key = tuple(stack)
+                    stacks[key] = stacks.get(key, 0.0) + elapsed_ms
+            del frames
+    
+    def to_speedscope(self, name: str) -> dict:
+        with self._lock:
+            frames = list(self._frames)
+            stacks = {thread_id: dict(thread_stacks) for thread_id, thread_stacks in self._stacks.items()}
+        
+        profiles = []
+        for thread_id, thread_stacks in stacks.items():
+            weights = list(thread_stacks.values())
+            profiles.append({
+                'type': 'sampled',
+                'name': self._trace.thread_name(thread_id),
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': [list(stack) for stack in thread_stacks],
+                'weights': weights
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'tidal-playlist-merger',
+            'shared': {'frames': frames},
+            'profiles': profiles
+        }
+
+class MergeTrace:
+    def __init__(self, merge_id: str, cpu_profile: bool = False):
+        self.merge_id = merge_id
+        self._origin = time.perf_counter()
+        self._events: List[dict] = []
+        self._threads: Dict[int, str] = {}
+        # Threads currently running this merge's work, with a nesting count; only these are sampled
+        self._active_threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        # The event loop also serves other requests, so its samples are not exclusive to this merge
+        loop_thread = self.register_thread(f"{threading.current_thread().name} (event loop, shared)")
+        self._active_threads[loop_thread] = 1
+        self._sampler = _CpuSampler(self) if cpu_profile else None
+        if self._sampler:
+            self._sampler.start()
+    
+    @property
+    def has_cpu_profile(self) -> bool:
+        return self._sampler is not None
+    
+    def now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1_000_000
+    
+    def register_thread(self, name: Optional[str] = None) -> int:
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            with self._lock:
+                self._threads[thread.ident] = name or thread.name
+        return thread.ident
+    
+    def enter_thread(self):
+        thread_id = self.register_thread()
+        with self._lock:
+            self._active_threads[thread_id] = self._active_threads.get(thread_id, 0) + 1
+    
+    def exit_thread(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            remaining = self._active_threads.get(thread_id, 0) - 1
+            if remaining > 0:
+                self._active_threads[thread_id] = remaining
+            else:
+                self._active_threads.pop(thread_id, None)
+    
+    def active_thread_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._active_threads)
+    
+    def thread_name(self, thread_id: int) -> str:
+        return self._threads.get(thread_id, str(thread_id))
+    
+    def add_span(self, name: str, cat: str, start_us: float, dur_us: float,
+                 args: Optional[dict] = None, tid: Optional[int] = None):
+        event = {
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'ts': start_us,
+            'dur': dur_us,
+            'pid': 1,
+            'tid': tid if tid is not None else self.register_thread(),
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._events.append(event)
+    
+    @contextmanager
+    def span(self, name: str, cat: str = 'merge', **args):
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.add_span(name, cat, start, self.now_us() - start, args)
+    
+    def finish(self):
+        if self._sampler:
+            self._sampler.stop()
+        with self._lock:
+            self._active_threads.clear()
+    
+    def to_chrome_trace(self) -> dict:
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        ]
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'mergeId': self.merge_id}
+        }
+    
+    def to_speedscope(self) -> Optional[dict]:
+        if not self._sampler:
+            return None
+        return self._sampler.to_speedscope(f"merge {self.merge_id}")
+
+def span(name: str, cat: str = 'merge', **args):
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return trace.span(name, cat, **args)
+
+def traced(name: str, cat: str = 'tidal'):
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with trace.span(name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def bind_trace(func: Callable, *args, **kwargs) -> Callable[[], Any]:
+    trace = _current_trace.get()
+    if trace is None:
+        return functools.partial(func, *args, **kwargs)
+    
+    label = getattr(func, '__name__', repr(func))
+    caller_tid = threading.get_ident()
+    submitted = trace.now_us()
+    
+    def worker():
+        trace.enter_thread()
+        started = trace.now_us()
+        trace.add_span('threadpool.wait', 'threadpool', submitted, started - submitted,
+                       {'func': label}, tid=caller_tid)
+        token = _current_trace.set(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+            trace.exit_thread()
+    
+    return worker
+
+async def run_sync(func: Callable, *args) -> Any:
+    trace = _current_trace.get()
+    if trace is None:
+        return await to_thread.run_sync(func, *args)
+    
+    label = getattr(func, '__name__', repr(func))
+    with trace.span(f"to_thread {label}", 'threadpool'):
+        return await to_thread.run_sync(bind_trace(func, *args))
+
+class ProfilingService:
+    def __init__(self):
+        self._traces: 'OrderedDict[str, MergeTrace]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def is_enabled(self) -> bool:
+        return PROFILING_ENABLED
+    
+    def start_trace(self, cpu_profile: bool = False) -> MergeTrace:
+        trace = MergeTrace(uuid.uuid4().hex, cpu_profile)
+        with self._lock:
+            self._traces[trace.merge_id] = trace
+            while len(self._traces) > MAX_STORED_TRACES:
+                self._traces.popitem(last=False)
+        logger.info(f"Profiling merge {trace.merge_id} (cpu_profile={cpu_profile})")
+        return trace
+    
+    def get_trace(self, merge_id: str) -> Optional[MergeTrace]:
+        with self._lock:
+            return self._traces.get(merge_id)
+    
+    @contextmanager
+    def activate(self, trace: Optional[MergeTrace]):
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
@@ -0,0 +1,219 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Deque, Optional, Any
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from .profiling_service import span, bind_trace
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+READ_DEADLINE = float(os.getenv('TIDAL_READ_DEADLINE', 20))
+HEDGE_DEFAULT_DELAY = float(os.getenv('TIDAL_HEDGE_DEFAULT_DELAY', 1.0))
+HEDGE_MIN_DELAY = float(os.getenv('TIDAL_HEDGE_MIN_DELAY', 0.2))
+HEDGE_MAX_DELAY = float(os.getenv('TIDAL_HEDGE_MAX_DELAY', 5.0))
+BREAKER_THRESHOLD = int(os.getenv('TIDAL_BREAKER_THRESHOLD', 5))
+BREAKER_COOLDOWN = float(os.getenv('TIDAL_BREAKER_COOLDOWN', 30))
+READ_WORKERS = int(os.getenv('TIDAL_READ_WORKERS', 16))
+CONNECT_TIMEOUT = 5.0
+
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+class UpstreamUnavailableError(Exception):
+    pass
+
+class DeadlineExceededError(Exception):
+    pass
+
+RESILIENCE_ERRORS = (UpstreamUnavailableError, DeadlineExceededError)
+
+def is_retryable(error: BaseException) -> bool:
+    # Only signs of a slow or broken upstream are retried and counted by the breaker;
+    # 4xx answers (auth, not found, rate limiting) are passed straight through
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, DeadlineExceededError)):
+        return True
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500
+    return False
+
+class TimeoutAdapter(HTTPAdapter):
+    def __init__(self, timeout: tuple, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+    
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+def install_transport_timeout(session, timeout: float = READ_DEADLINE):
+    request_session = getattr(session, 'request_session', None)
+    if request_session is None or getattr(request_session, '_tidal_timeout_installed', False):
+        return
+    adapter = TimeoutAdapter((min(CONNECT_TIMEOUT, timeout), timeout))
+    request_session.mount('https://', adapter)
+    request_session.mount('http://', adapter)
+    request_session._tidal_timeout_installed = True
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, op: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(op)
+            if samples is None:
+                samples = self._samples[op] = deque(maxlen=self._window)
+            samples.append(seconds)
+    
+    def p95(self, op: str) -> Optional[float]:
+        with self._lock:
+            samples = self._samples.get(op)
+            if not samples or len(samples) < LATENCY_MIN_SAMPLES:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    
+    def hedge_delay(self, op: str) -> float:
+        p95 = self.p95(op)
+        if p95 is None:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p95))
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            
+            raise UpstreamUnavailableError(
+                f"TIDAL is responding slowly or failing; pausing requests for "
+                f"{max(1, round(remaining))}s. Please try again shortly."
+            )
+    
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("TIDAL circuit closed")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"TIDAL circuit opened after {self._failures} consecutive failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+class ResilientReader:
+    def __init__(self, deadline: float = READ_DEADLINE, max_attempts: int = 2):
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix='tidal-read')
+        self._in_flight = 0
+        self._lock = threading.Lock()
+    
+    def _submit(self, op: str, func: Callable, args: tuple, kwargs: dict) -> Future:
+        with self._lock:
+            self._in_flight += 1
+        submitted_at = time.monotonic()
+        
+        def on_done(future: Future):
+            self._release()
+            # Every successful attempt is sampled, including a slow primary that lost to its hedge,
+            # so the p95 keeps its tail
+            if not future.cancelled() and future.exception() is None:
+                self.latency.record(op, time.monotonic() - submitted_at)
+        
+        future = self._executor.submit(bind_trace(func, *args, **kwargs))
+        future.add_done_callback(on_done)
+        return future
+    
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+    
+    def _is_saturated(self) -> bool:
+        with self._lock:
+            return self._in_flight >= READ_WORKERS
+    
+    def call(self, op: str, func: Callable, *args, **kwargs) -> Any:
+        self.breaker.before_call()
+        
+        with span(f"read {op}", 'tidal'):
+            start = time.monotonic()
+            deadline_at = start + self.deadline
+            hedge_at = start + self.latency.hedge_delay(op)
+            pending = {self._submit(op, func, args, kwargs)}
+            attempts = 1
+            last_error: Optional[BaseException] = None
+            
+            while True:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    self.breaker.record_failure()
+                    raise DeadlineExceededError(f"TIDAL did not respond to {op} within {self.deadline:g}s")
+                
+                can_hedge = attempts < self.max_attempts and not self._is_saturated()
+                if can_hedge and (now >= hedge_at or not pending):
+                    logger.info(f"Hedging {op} after {now - start:.2f}s")
+                    with span(f"hedge {op}", 'tidal'):
+                        pending.add(self._submit(op, func, args, kwargs))
+                    attempts += 1
+                    continue
+                
+                if not pending:
+                    self.breaker.record_failure()
+                    raise last_error
+                
+                wait_until = min(deadline_at, hedge_at) if can_hedge else deadline_at
+                done, pending = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        self.breaker.record_success()
+                        return future.result()
+                    if not is_retryable(error):
+                        self.breaker.record_success()
+                        raise error
+                    last_error = error
@@ -1,21 +1,37 @@
 import logging
-from typing import List
+from typing import List, Iterator, NamedTuple, Optional
+
+from .profiling_service import traced
+from .resilience import ResilientReader, install_transport_timeout, RESILIENCE_ERRORS
 
 logger = logging.getLogger(__name__)
 
+TRACK_PAGE_SIZE = 100
+
+class TrackRecord(NamedTuple):
+    id: str
+    name: str
+    artist: str
+    duration: Optional[int]
+
 class TidalService:
+    def __init__(self):
+        self._reader = ResilientReader()
+    
     def _get_session(self):
         from . import auth_service
         session = auth_service.get_session_object()
         if session is None:
             raise Exception('Not authenticated. Please log in again.')
+        install_transport_timeout(session, self._reader.deadline)
         return session
     
+    @traced('tidal.get_playlist_by_id')
     def get_playlist_by_id(self, playlist_id: str) -> dict:
         session = self._get_session()
         
         try:
-            playlist = session.playlist(playlist_id)
+            playlist = self._reader.call('playlist', session.playlist, playlist_id)
             
             cover_url = None
             fallback_covers = []
@@ -28,7 +44,7 @@ class TidalService:
             
             if not cover_url:
                 try:
-                    tracks = playlist.tracks(limit=50)
+                    tracks = self._reader.call('playlist.cover_tracks', playlist.tracks, limit=50)
                     seen_covers = set()
                     for track in tracks:
                         if len(fallback_covers) >= 4:
@@ -44,6 +60,8 @@ class TidalService:
                             if album_cover and album_cover not in seen_covers:
                                 seen_covers.add(album_cover)
                                 fallback_covers.append(album_cover)
+                except RESILIENCE_ERRORS:
+                    raise
                 except Exception as e:
                     logger.info(f"Could not get fallback covers: {e}")
             
@@ -55,44 +73,51 @@ class TidalService:
                 'fallbackCovers': fallback_covers,
                 'description': playlist.description if hasattr(playlist, 'description') else None
             }
+        except RESILIENCE_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Error fetching playlist {playlist_id}: {e}")
             raise Exception(f'Failed to fetch playlist: {str(e)}')
     
-    def get_playlist_tracks(self, playlist_id: str) -> List[dict]:
+    def iter_playlist_tracks(self, playlist_id: str, page_size: int = TRACK_PAGE_SIZE) -> Iterator[List[TrackRecord]]:
         session = self._get_session()
         
         try:
-            playlist = session.playlist(playlist_id)
-            
-            # Use limit=None to fetch ALL tracks (no pagination limit)
-            all_tracks = []
+            playlist = self._reader.call('playlist', session.playlist, playlist_id)
             offset = 0
-            limit = 100
+            fetched = 0
             
             while True:
-                tracks = playlist.tracks(limit=limit, offset=offset)
+                tracks = self._reader.call('playlist.tracks', playlist.tracks, limit=page_size, offset=offset)
                 if not tracks:
                     break
-                all_tracks.extend(tracks)
-                if len(tracks) < limit:
+                
+                page = [
+                    TrackRecord(
+                        str(track.id),
+                        track.name,
+                        track.artist.name if track.artist else 'Unknown Artist',
+                        getattr(track, 'duration', None)
+                    )
+                    for track in tracks
+                ]
+                is_last_page = len(tracks) < page_size
+                # Drop the full Track objects before suspending so only compact records outlive the page
+                del tracks
+                
+                fetched += len(page)
+                yield page
+                
+                if is_last_page:
                     break
-                offset += limit
-            
-            result = []
-            for track in all_tracks:
-                result.append({
-                    'id': str(track.id),
-                    'name': track.name,
-                    'artist': track.artist.name if track.artist else 'Unknown Artist'
-                })
+                offset += page_size
             
-            logger.info(f"Fetched {len(result)} tracks from playlist {playlist_id}")
-            return result
+            logger.info(f"Fetched {fetched} tracks from playlist {playlist_id}")
         except Exception as e:
             logger.error(f"Error fetching tracks: {e}")
             raise Exception(f'Failed to fetch tracks: {str(e)}')
     
+    @traced('tidal.create_playlist')
     def create_playlist(self, title: str, description: str = '') -> dict:
         session = self._get_session()
         
@@ -109,6 +134,7 @@ class TidalService:
             logger.error(f"Error creating playlist: {e}")
             raise Exception(f'Failed to create playlist: {str(e)}')
     
+    @traced('tidal.add_tracks_to_playlist')
     def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str], on_progress=None) -> None:
         if not track_ids:
             logger.warning("No tracks to add")
@@ -142,6 +168,7 @@ class TidalService:
             logger.error(f"Error adding tracks: {e}")
             raise Exception(f'Failed to add tracks: {str(e)}')
     
+    @traced('tidal.delete_playlist')
     def delete_playlist(self, playlist_id: str) -> bool:
         session = self._get_session()
         
@@ -1 +1,2 @@
 from .url_parser import extract_playlist_id
+from .export_formats import EXPORT_FORMATS, export_header, export_row, export_error
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from services.tidal_service import TrackRecord
+
+EXPORT_FORMATS = {
+    'm3u': 'audio/x-mpegurl',
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+CSV_FIELDS = ['id', 'name', 'artist', 'duration', 'url']
+
+def track_url(track_id: str) -> str:
+    return f"https://tidal.com/browse/track/{track_id}"
+
+def export_header(fmt: str) -> Optional[str]:
+    if fmt == 'm3u':
+        return "#EXTM3U\n"
+    if fmt == 'csv':
+        return _csv_line(CSV_FIELDS)
+    return None
+
+def export_row(fmt: str, track: 'TrackRecord') -> str:
+    track_id = track.id
+    name = track.name or 'Unknown'
+    artist = track.artist or 'Unknown Artist'
+    duration = track.duration
+    
+    if fmt == 'm3u':
+        seconds = duration if duration is not None else -1
+        return f"#EXTINF:{seconds},{_single_line(artist)} - {_single_line(name)}\n{track_url(track_id)}\n"
+    if fmt == 'csv':
+        return _csv_line([track_id, name, artist, '' if duration is None else duration, track_url(track_id)])
+    return json.dumps({
+        'id': track_id,
+        'name': name,
+        'artist': artist,
+        'duration': duration,
+        'url': track_url(track_id)
+    }) + "\n"
+
+def export_error(fmt: str, message: str) -> Optional[str]:
+    if fmt == 'ndjson':
+        return json.dumps({'error': message}) + "\n"
+    return None
+
+def _single_line(value: str) -> str:
+    return value.replace('\r\n', ' ').replace('\r', ' ').replace('\n', ' ')
+
+def _csv_line(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()